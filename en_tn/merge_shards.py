@@ -0,0 +1,141 @@
+"""
+Merge Shard Outputs
+Appends the per-shard files written by `scraper.py --shards N` to the main output files
+"""
+
+import argparse
+import csv
+import os
+import shutil
+from pathlib import Path
+from typing import Set
+
+from scraper import (CHECKPOINT_FILE, CSV_BUFFER, FAILED_CSV, FAILED_FIELDS, IDS_FILE, OUTPUT_CSV, OUTPUT_FIELDS,
+                     TRANSLATIONS_FILE, csv_header, csv_row, load_checkpoint, load_processed_ids,
+                     save_checkpoint, shard_path, sync_file)
+
+
+COPY_BUFFER = 1 << 20  # bytes copied per step
+
+
+def append_file(src: Path, dst, skip_header: bool):
+    """Stream src onto the end of dst without parsing it"""
+    with open(src, 'rb') as f:
+        if skip_header:
+            f.readline()
+        shutil.copyfileobj(f, dst, COPY_BUFFER)
+
+
+def read_new_rows(src: Path, skip_ids: Set[str]) -> tuple[dict[str, bytes], int]:
+    """
+    Read the complete rows of a shard CSV whose ID is not in skip_ids, formatted for the main CSV
+    and keyed by ID (the first row wins), together with the number of rows skipped as duplicates.
+    """
+    with open(src, 'r', encoding='utf-8', newline='') as f:
+        records = list(csv.DictReader(f))
+    with open(src, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n' and records:
+                # Every row ends with a newline: the last one was cut short by a crash and is scraped again
+                records.pop()
+
+    rows = {}
+    duplicates = 0
+    for row in records:
+        sentence_id = row.get('id')
+        if not (sentence_id and row.get('english') and row.get('tunisian')):
+            # Missing a field: not a translation
+            continue
+        if sentence_id in skip_ids or sentence_id in rows:
+            duplicates += 1
+            continue
+        rows[sentence_id] = csv_row(sentence_id, row['english'], row['tunisian'])
+    return rows, duplicates
+
+
+def merge_shards(shards: int):
+    """Append every shard's rows, IDs, translations and failures to the main files, then remove the shard files"""
+    # Make sure the main index matches the main CSV before appending to both
+    checkpoint = load_checkpoint()
+    processed_ids = load_processed_ids(checkpoint)
+
+    output_exists = OUTPUT_CSV.exists()
+    failed_exists = FAILED_CSV.exists()
+    csv_file = open(OUTPUT_CSV, 'ab', buffering=CSV_BUFFER)
+    ids_file = open(IDS_FILE, 'ab', buffering=CSV_BUFFER)
+    failed_file = open(FAILED_CSV, 'ab', buffering=CSV_BUFFER)
+    # Without a main translation cache there is nothing to extend: the next run rebuilds it from the CSV
+    translations_file = None
+    if TRANSLATIONS_FILE.exists():
+        translations_file = open(TRANSLATIONS_FILE, 'ab', buffering=CSV_BUFFER)
+
+    if not output_exists:
+        csv_file.write(csv_header(OUTPUT_FIELDS))
+    if not failed_exists:
+        failed_file.write(csv_header(FAILED_FIELDS))
+
+    merged_ids = set()
+    merged_shards = []
+
+    try:
+        for shard_id in range(shards):
+            shard_csv = shard_path(OUTPUT_CSV, shard_id)
+            shard_failed = shard_path(FAILED_CSV, shard_id)
+            shard_translations = shard_path(TRANSLATIONS_FILE, shard_id)
+
+            if not shard_csv.exists() and not shard_failed.exists():
+                print(f"⏭️  Shard {shard_id}: nothing to merge")
+                continue
+
+            if shard_csv.exists():
+                # Take the IDs from the shard CSV itself: a shard that stopped between
+                # flushes can hold rows its own processed_ids index does not list yet.
+                # Rows already in the main CSV or an earlier shard are left out of both files.
+                try:
+                    new_rows, duplicates = read_new_rows(shard_csv, processed_ids | merged_ids)
+                except Exception as e:
+                    print(f"⚠️  Shard {shard_id}: could not read {shard_csv.name} ({e}), left unmerged")
+                    continue
+                if duplicates:
+                    print(f"⚠️  Shard {shard_id}: skipped {duplicates} rows whose ID was already merged")
+                csv_file.write(b"".join(new_rows.values()))
+                ids_file.write("".join(f"{sentence_id}\n" for sentence_id in new_rows).encode('utf-8'))
+                merged_ids.update(new_rows)
+            if shard_failed.exists():
+                append_file(shard_failed, failed_file, skip_header=True)
+            if translations_file and shard_translations.exists():
+                append_file(shard_translations, translations_file, skip_header=False)
+
+            merged_shards.append(shard_id)
+            print(f"✅ Shard {shard_id} merged")
+    finally:
+        # CSV before index, so the index never lists a row the CSV is missing
+        for f in filter(None, (csv_file, ids_file, translations_file, failed_file)):
+            sync_file(f)
+            f.close()
+
+    last_id = checkpoint['last_id'] if checkpoint else None
+    save_checkpoint(last_id, len(processed_ids) + len(merged_ids))
+
+    for shard_id in merged_shards:
+        for path in (OUTPUT_CSV, IDS_FILE, TRANSLATIONS_FILE, FAILED_CSV, CHECKPOINT_FILE):
+            shard_path(path, shard_id).unlink(missing_ok=True)
+
+    print(f"\n📊 Merge Summary:")
+    print(f"🧩 Shards merged: {len(merged_shards)}/{shards}")
+    print(f"✅ Translations added: {len(merged_ids)}")
+    print(f"💾 Saved to: {OUTPUT_CSV}")
+
+
+def main(argv=None):
+    """Merge shard outputs"""
+    parser = argparse.ArgumentParser(description="Merge the outputs of scraper.py --shards N")
+    parser.add_argument("--shards", type=int, required=True, help="number of shards the scrape was split into")
+    args = parser.parse_args(argv)
+    merge_shards(args.shards)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,30 +3,51 @@ Retry Failed Translations
 Attempts to re-scrape sentences that previously failed
 """
 
+import argparse
+import asyncio
 import csv
-import time
 from pathlib import Path
+from typing import Optional
 
-from scraper import translate_with_retry, REQUEST_DELAY
+from scraper import (CSV_BUFFER, IDS_FILE, FlushPolicy, add_flush_args, check_flush_args, csv_header, csv_row,
+                     load_checkpoint, load_processed_ids, normalize_sentence, open_translations_file,
+                     save_checkpoint, sync_file, translate_all, translation_line)
 
 
 FAILED_CSV = Path(__file__).parent / "failed_translations.csv"
 OUTPUT_CSV = Path(__file__).parent / "en_tn_couples.csv"
 RETRY_OUTPUT = Path(__file__).parent / "retry_results.csv"
+RETRY_FIELDS = ['id', 'english', 'tunisian', 'status']
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Retry translations listed in failed_translations.csv")
+    add_flush_args(parser)
+    args = parser.parse_args(argv)
+    check_flush_args(parser, args)
+    return args
+
+
+def main(argv=None):
     """Retry failed translations"""
+    args = parse_args(argv)
+    
     if not FAILED_CSV.exists():
         print("❌ No failed_translations.csv found")
         return
     
-    # Read failed translations
-    failed = []
+    # Read failed translations, skipping any that have since been translated.
+    # Each scraper run appends its failures, so the same ID can be listed several times.
+    checkpoint = load_checkpoint()
+    processed_ids = load_processed_ids(checkpoint)
+    failed = {}
     with open(FAILED_CSV, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            failed.append((row['id'], row['english']))
+            if row['id'] not in processed_ids:
+                failed[row['id']] = row['english']
+    failed = list(failed.items())
     
     print(f"🔄 Found {len(failed)} failed translations to retry")
     
@@ -35,51 +56,49 @@ def main():
         return
     
     # Open output files
-    success_file = open(OUTPUT_CSV, 'a', encoding='utf-8', newline='')
-    success_writer = csv.DictWriter(success_file, fieldnames=['id', 'english', 'tunisian'])
+    success_file = open(OUTPUT_CSV, 'ab', buffering=CSV_BUFFER)
+    ids_file = open(IDS_FILE, 'a', encoding='utf-8')
+    translations_file = open_translations_file()
+    index_files = [f for f in (ids_file, translations_file) if f]
     
-    retry_file = open(RETRY_OUTPUT, 'w', encoding='utf-8', newline='')
-    retry_writer = csv.DictWriter(retry_file, fieldnames=['id', 'english', 'tunisian', 'status'])
-    retry_writer.writeheader()
+    retry_file = open(RETRY_OUTPUT, 'wb', buffering=CSV_BUFFER)
+    retry_file.write(csv_header(RETRY_FIELDS))
+    
+    success_flush = FlushPolicy(success_file, *index_files, every=args.flush_every, interval=args.flush_interval)
+    retry_flush = FlushPolicy(retry_file, every=args.flush_every, interval=args.flush_interval)
     
     success_count = 0
     still_failed = 0
     
+    def handle_result(sentence_id: str, english_text: str, tunisian_text: Optional[str], status: str):
+        nonlocal success_count, still_failed
+        
+        if status == 'success':
+            # Save to main CSV
+            success_file.write(csv_row(sentence_id, english_text, tunisian_text))
+            ids_file.write(f"{sentence_id}\n")
+            if translations_file:
+                translations_file.write(translation_line(normalize_sentence(english_text), tunisian_text))
+            success_flush.row_written()
+            success_count += 1
+        else:
+            # Log in retry results
+            retry_file.write(csv_row(sentence_id, english_text, tunisian_text or '', status))
+            retry_flush.row_written()
+            still_failed += 1
+    
     try:
-        for sentence_id, english_text in failed:
-            print(f"Retrying ID {sentence_id}...", end=' ')
-            
-            tunisian_text, status = translate_with_retry(english_text, sentence_id)
-            
-            if status == 'success':
-                # Save to main CSV
-                success_writer.writerow({
-                    'id': sentence_id,
-                    'english': english_text,
-                    'tunisian': tunisian_text
-                })
-                success_file.flush()
-                success_count += 1
-                print("✅")
-            else:
-                # Log in retry results
-                retry_writer.writerow({
-                    'id': sentence_id,
-                    'english': english_text,
-                    'tunisian': tunisian_text or '',
-                    'status': status
-                })
-                retry_file.flush()
-                still_failed += 1
-                print(f"❌ ({status})")
-            
-            time.sleep(REQUEST_DELAY)
+        asyncio.run(translate_all(failed, handle_result, total=len(failed), desc="Retrying"))
     
     except KeyboardInterrupt:
         print("\n\n⚠️  Interrupted by user")
     finally:
-        success_file.close()
-        retry_file.close()
+        for f in (success_file, *index_files, retry_file):
+            sync_file(f)
+            f.close()
+        # Keep the scraper's checkpoint in step with the rows appended here
+        last_id = checkpoint['last_id'] if checkpoint else None
+        save_checkpoint(last_id, len(processed_ids) + success_count)
         
         print(f"\n📊 Retry Summary:")
         print(f"✅ Now successful: {success_count}")
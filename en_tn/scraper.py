@@ -4,13 +4,22 @@ Scrapes translations from klemy.qodek.net/staging for sentences in eng_sentences
 Saves progress to CSV with resume capability
 """
 
+import argparse
+import asyncio
 import csv
+import json
+import math
+import multiprocessing
+import os
+import random
 import re
 import time
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Optional, Set
+from typing import Callable, Iterable, Iterator, Optional, Set, Union
 
-import requests
+import httpx
+from selectolax.lexbor import LexborHTMLParser, LexborNode
 from tqdm import tqdm
 
 
@@ -18,45 +27,155 @@ from tqdm import tqdm
 URL = "https://klemy.qodek.net/staging"
 INPUT_TSV = Path(__file__).parent / "eng_sentences.tsv"
 OUTPUT_CSV = Path(__file__).parent / "en_tn_couples.csv"
+IDS_FILE = Path(__file__).parent / "processed_ids.txt"
+TRANSLATIONS_FILE = Path(__file__).parent / "translation_cache.tsv"
 CHECKPOINT_FILE = Path(__file__).parent / ".scraper_checkpoint.txt"
 FAILED_CSV = Path(__file__).parent / "failed_translations.csv"
 DEBUG_LOG = Path(__file__).parent / "scraper_debug.log"
 
 # Rate limiting
-REQUEST_DELAY = 5.0  # seconds between requests
+REQUEST_DELAY = 5.0  # average seconds between requests
+MAX_CONCURRENT = 12  # requests allowed in flight at once
 MAX_RETRIES = 3
-RETRY_DELAY = 5.0  # seconds
+RETRY_DELAY = 5.0  # base of the exponential backoff between attempts, in seconds
+RETRY_MAX_DELAY = 60.0  # cap on the backoff (a server's Retry-After is honored as is)
+BATCH_SIZE = 1  # sentences sent per request (see --batch)
+WRITE_QUEUE_SIZE = 256  # finished batches waiting for the writer
 
+# Output durability
+FLUSH_EVERY = 64  # rows written between flushes
+FLUSH_INTERVAL_S = 30.0  # max seconds a written row may stay buffered
 
-def call_klemy(text: str) -> str:
-    """Call the Klemy translation API"""
-    headers = {"accept": "*/*"}
+# Input
+TSV_BUFFER = 1 << 20  # read buffer for the sentence TSV
+
+# CSV output
+OUTPUT_FIELDS = ['id', 'english', 'tunisian']
+FAILED_FIELDS = ['id', 'english', 'status']
+CSV_BUFFER = 1 << 16  # bytes buffered per output file between flushes
+
+# Resume state
+CHECKPOINT_VERSION = 1
+CHECKPOINT_MAX_AGE_S = 24 * 60 * 60  # older checkpoints are not trusted
+
+# Response parsing
+MIN_RESPONSE_BYTES = 32  # anything shorter is an empty or error body
+FS3_SELECTOR = 'p.fs-3'
+_WS_RE = re.compile(r'\s+')
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding at most `capacity`.
+    Every dispatched request takes a token; a request that never reached the
+    server gives its token back, so fast failures do not eat into the rate.
+    A pause (a server's Retry-After) holds back every request until it ends.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        # During a pause _updated lies in the future and nothing is refilled
+        if now > self._updated:
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+
+    async def acquire(self):
+        """Wait until no pause is running and a token is available, and take it"""
+        while True:
+            self._refill()
+            wait = max(self._updated - time.monotonic(), (1 - self._tokens) / self._rate)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        self._tokens -= 1
+
+    def refund(self):
+        """Return a token taken for a request that was never sent"""
+        self._tokens = min(self._capacity, self._tokens + 1)
+
+    def pause(self, seconds: float):
+        """
+        Hand out no token for the next `seconds`, then restart at the normal rate
+        with at most one token, so the end of the pause does not release a burst.
+        """
+        self._refill()
+        self._tokens = min(self._tokens, 1)
+        self._updated = max(self._updated, time.monotonic() + seconds)
+
+
+def create_client() -> httpx.AsyncClient:
+    """
+    Create the HTTP client shared by every request of a run.
+    HTTP/2 lets concurrent requests share one connection as multiplexed streams;
+    against an HTTP/1.1-only server the pool falls back to one request per connection.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=4, max_connections=MAX_CONCURRENT),
+        headers={"accept": "*/*"},
+        timeout=30,
+    )
+
+
+async def call_klemy(client: httpx.AsyncClient, bucket: TokenBucket, text: Union[str, list[str]]) -> bytes:
+    """
+    Call the Klemy translation API and return the raw response body.
+    A list of texts is sent as repeated `text` form fields in a single request.
+    """
     payload = {
         "target_lang": "Tunisian Dialect",
         "output_alphabet": "Arabic",
         "text": text,
     }
     
-    response = requests.post(URL, headers=headers, data=payload, timeout=30)
+    await bucket.acquire()
+    try:
+        response = await client.post(URL, data=payload)
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+        # The request never left this machine
+        bucket.refund()
+        raise
     response.raise_for_status()
-    return response.text
+    return response.content
+
+
+def _may_contain_translation(html: bytes) -> bool:
+    """Cheap checks that rule out empty and error pages before the HTML is parsed"""
+    return len(html) >= MIN_RESPONSE_BYTES and b'fs-3' in html
+
+
+def _clean_paragraph(node: LexborNode) -> Optional[str]:
+    """Text of the paragraph with nested tags dropped, entities decoded and whitespace normalized"""
+    inner_text = node.text(deep=True, separator='', strip=False)
+    cleaned = _WS_RE.sub(' ', inner_text).strip()
+    return cleaned or None
 
 
-def extract_fs3_paragraph(html: str) -> Optional[str]:
+def extract_fs3_paragraph(html: bytes) -> Optional[str]:
     """
     Extract text inside <p class="fs-3">...</p> from the HTML response.
     Returns cleaned text or None if not found.
     """
-    match = re.search(r'<p[^>]*class="fs-3"[^>]*>(.*?)</p>', html, re.DOTALL | re.IGNORECASE)
-    if not match:
+    if not _may_contain_translation(html):
         return None
 
-    inner_html = match.group(1)
-    # Remove any nested tags
-    inner_text = re.sub(r"<.*?>", "", inner_html)
-    # Normalize whitespace
-    cleaned = " ".join(inner_text.split())
-    return cleaned.strip() or None
+    node = LexborHTMLParser(html).css_first(FS3_SELECTOR)
+    if node is None:
+        return None
+    return _clean_paragraph(node)
+
+
+def extract_fs3_paragraphs(html: bytes) -> list[Optional[str]]:
+    """Extract the cleaned text of every <p class="fs-3"> paragraph, in page order"""
+    if not _may_contain_translation(html):
+        return []
+    return [_clean_paragraph(node) for node in LexborHTMLParser(html).css(FS3_SELECTOR)]
 
 
 def log_debug(message: str):
@@ -66,14 +185,52 @@ def log_debug(message: str):
         f.write(f"[{timestamp}] {message}\n")
 
 
-def translate_with_retry(text: str, sentence_id: str) -> tuple[Optional[str], str]:
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), None if absent or invalid"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def is_throttled(error: httpx.HTTPError) -> bool:
+    """Whether the server answered 429 Too Many Requests or 503 Service Unavailable"""
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in (429, 503)
+
+
+def retry_delay(error: httpx.HTTPError, attempt: int) -> float:
+    """
+    Seconds to wait before retrying after error on the given (0-based) attempt:
+    the server's Retry-After on 429/503, otherwise capped exponential backoff with jitter.
+    """
+    if is_throttled(error):
+        retry_after = parse_retry_after(error.response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+    return min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+async def translate_with_retry(
+    client: httpx.AsyncClient, bucket: TokenBucket, text: str, sentence_id: str
+) -> tuple[Optional[str], str]:
     """
     Translate text with retry logic
     Returns: (translation, status) where status is 'success', 'no_translation', or 'error'
     """
     for attempt in range(MAX_RETRIES):
         try:
-            html = call_klemy(text)
+            html = await call_klemy(client, bucket, text)
             translation = extract_fs3_paragraph(html)
             
             if translation:
@@ -85,10 +242,16 @@ def translate_with_retry(text: str, sentence_id: str) -> tuple[Optional[str], st
                     print(f"\n⚠️  No translation found for ID {sentence_id}: {text[:50]}...")
                 return None, 'no_translation'
                 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
+            delay = retry_delay(e, attempt)
+            if is_throttled(e):
+                # The server asks every request to wait, not just this one
+                bucket.pause(delay)
             if attempt < MAX_RETRIES - 1:
-                print(f"\n⚠️  Error for ID {sentence_id} (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
-                time.sleep(RETRY_DELAY)
+                print(f"\n⚠️  Error for ID {sentence_id} (attempt {attempt + 1}/{MAX_RETRIES}): {e} "
+                      f"- retrying in {delay:.1f}s")
+                # The bucket refills meanwhile, so the next attempt rarely waits for a token too
+                await asyncio.sleep(delay)
             else:
                 print(f"\n❌ Failed after {MAX_RETRIES} attempts for ID {sentence_id}: {e}")
                 log_debug(f"ID {sentence_id}: Request failed - {e}")
@@ -97,148 +260,616 @@ def translate_with_retry(text: str, sentence_id: str) -> tuple[Optional[str], st
     return None, 'error'
 
 
-def load_processed_ids() -> Set[str]:
-    """Load IDs that have already been processed"""
+async def translate_one(
+    client: httpx.AsyncClient, bucket: TokenBucket, sentence_id: str, text: str
+) -> tuple[str, str, Optional[str], str]:
+    """Translate one sentence and return it together with its ID and status"""
+    translation, status = await translate_with_retry(client, bucket, text, sentence_id)
+    return sentence_id, text, translation, status
+
+
+async def translate_batch(
+    client: httpx.AsyncClient, bucket: TokenBucket, batch: list[tuple[str, str]]
+) -> list[tuple[str, str, Optional[str], str]]:
+    """
+    Translate several sentences with one request, expecting one fs-3 paragraph per sentence.
+    If the request fails or the paragraphs do not line up with the batch,
+    every sentence of the batch is retried on its own.
+    """
+    if len(batch) == 1:
+        return [await translate_one(client, bucket, *batch[0])]
+
+    try:
+        html = await call_klemy(client, bucket, [text for _, text in batch])
+        translations = extract_fs3_paragraphs(html)
+        if len(translations) == len(batch) and all(translations):
+            return [(sentence_id, text, translation, 'success')
+                    for (sentence_id, text), translation in zip(batch, translations)]
+        log_debug(f"Batch {batch[0][0]}..{batch[-1][0]}: got {len(translations)} fs-3 paragraphs "
+                  f"for {len(batch)} sentences, falling back to single requests")
+    except httpx.HTTPError as e:
+        log_debug(f"Batch {batch[0][0]}..{batch[-1][0]}: Request failed - {e}, falling back to single requests")
+        if is_throttled(e):
+            # Hold back every request, including the single ones below, as the server asked
+            bucket.pause(retry_delay(e, 0))
+
+    return list(await asyncio.gather(*(translate_one(client, bucket, *item) for item in batch)))
+
+
+async def enqueue_translations(
+    client: httpx.AsyncClient, bucket: TokenBucket, batch: list[tuple[str, str]], queue: asyncio.Queue,
+    in_flight: Optional[dict[str, asyncio.Future]] = None,
+):
+    """
+    Translate a batch and hand its results to the writer.
+    Then resolve the batch's in_flight futures (keyed by normalized text) with the
+    translation, or None if there is none, for the duplicates waiting on them.
+    """
+    results = []
+    try:
+        results = await translate_batch(client, bucket, batch)
+        await queue.put(results)
+    finally:
+        if in_flight is not None:
+            translations = {sentence_id: translation for sentence_id, _, translation, status in results
+                            if status == 'success'}
+            for sentence_id, text in batch:
+                future = in_flight.pop(normalize_sentence(text), None)
+                if future is not None and not future.done():
+                    future.set_result(translations.get(sentence_id))
+
+
+async def enqueue_duplicate(
+    client: httpx.AsyncClient, bucket: TokenBucket, sentence_id: str, text: str,
+    original: asyncio.Future, queue: asyncio.Queue,
+):
+    """Reuse the translation of the identical sentence in flight, or request this one if that failed"""
+    translation = await original
+    if translation:
+        await queue.put([(sentence_id, text, translation, 'success')])
+    else:
+        await queue.put([await translate_one(client, bucket, sentence_id, text)])
+
+
+async def write_results(
+    queue: asyncio.Queue, on_result: Callable[[str, str, Optional[str], str], None], progress: tqdm
+):
+    """Single consumer of the results queue, and so the only caller of on_result, until a None sentinel"""
+    while True:
+        results = await queue.get()
+        if results is None:
+            return
+        for result in results:
+            on_result(*result)
+        progress.update(len(results))
+
+
+async def translate_all(
+    sentences: Iterable[tuple[str, str]],
+    on_result: Callable[[str, str, Optional[str], str], None],
+    total: Optional[int] = None,
+    desc: str = "Scraping",
+    batch_size: int = BATCH_SIZE,
+    lookup: Optional[Callable[[str], Optional[str]]] = None,
+    position: Optional[int] = None,
+):
+    """
+    Translate (id, text) pairs concurrently over one shared HTTP client.
+    A token bucket keeps the average rate at one request per REQUEST_DELAY while up to
+    MAX_CONCURRENT requests, of batch_size sentences each, overlap.
+    Sentences for which lookup(text) returns a translation are not requested; with a lookup,
+    a sentence identical (see normalize_sentence) to one in flight waits for its translation.
+    Results go through a bounded queue to a single writer task, which calls
+    on_result(id, english, translation, status) in completion order.
+    position pins the progress bar to a terminal line so parallel shards do not overwrite each other.
+    """
+    bucket = TokenBucket(1 / REQUEST_DELAY, MAX_CONCURRENT)
+    queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+    items = iter(sentences)
+    pending = set()
+    in_flight = {} if lookup else None
+
+    async with create_client() as client:
+        # Redraw at most once a second; the rate is low enough that a miniters
+        # threshold would leave the bar frozen for minutes at a time
+        with tqdm(total=total, desc=desc, mininterval=1.0, smoothing=0.1, position=position) as progress:
+            writer = asyncio.create_task(write_results(queue, on_result, progress))
+            try:
+                while True:
+                    # Keep the window full without materializing a task per sentence
+                    while len(pending) < MAX_CONCURRENT:
+                        batch = []
+                        for sentence_id, text in items:
+                            translation = lookup(text) if lookup else None
+                            key = normalize_sentence(text) if lookup else None
+                            if translation:
+                                pending.add(asyncio.create_task(
+                                    queue.put([(sentence_id, text, translation, 'success')])))
+                            elif lookup and key in in_flight:
+                                pending.add(asyncio.create_task(
+                                    enqueue_duplicate(client, bucket, sentence_id, text, in_flight[key], queue)))
+                            else:
+                                if lookup:
+                                    in_flight[key] = asyncio.get_running_loop().create_future()
+                                batch.append((sentence_id, text))
+                            if len(batch) == batch_size or len(pending) >= MAX_CONCURRENT:
+                                break
+                        if not batch:
+                            break
+                        pending.add(asyncio.create_task(
+                            enqueue_translations(client, bucket, batch, queue, in_flight)))
+
+                    if not pending:
+                        break
+
+                    done, pending = await asyncio.wait(pending | {writer}, return_when=asyncio.FIRST_COMPLETED)
+                    if writer in done:
+                        # The writer only stops early on an error: surface it
+                        writer.result()
+                    pending.discard(writer)
+                    for task in done:
+                        task.result()
+
+                await queue.put(None)
+                await writer
+            finally:
+                for task in pending:
+                    task.cancel()
+                if not writer.done():
+                    writer.cancel()
+                    # Interrupted: still write the results that were already translated
+                    while not queue.empty():
+                        for result in queue.get_nowait() or ():
+                            on_result(*result)
+
+
+def read_csv_ids(path: Path) -> Set[str]:
+    """IDs of every row in an output CSV"""
+    ids = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if 'id' in row and row['id']:
+                ids.add(row['id'])
+    return ids
+
+
+def load_processed_ids(checkpoint: Optional[dict], readonly: bool = False) -> Set[str]:
+    """
+    Load IDs that have already been processed.
+    Reads the IDS_FILE index when the checkpoint vouches for it (same success count);
+    otherwise rebuilds the index from the output CSV.
+    With readonly, a rebuild stays in memory and no file is written or moved, so several
+    processes can load the same index at once.
+    """
+    if IDS_FILE.exists() and checkpoint is not None:
+        processed = set(IDS_FILE.read_text(encoding='utf-8').split())
+        if len(processed) == checkpoint['success']:
+            return processed
+    
     processed = set()
     
     if OUTPUT_CSV.exists():
+        print("🔁 Rebuilding processed ID index from CSV...")
         try:
-            with open(OUTPUT_CSV, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if 'id' in row and row['id']:
-                        processed.add(row['id'])
+            processed = read_csv_ids(OUTPUT_CSV)
         except Exception as e:
+            if readonly:
+                print(f"⚠️  Warning: Could not read existing CSV ({e}).")
+                return processed
             print(f"⚠️  Warning: Could not read existing CSV ({e}). Starting fresh.")
             # Backup the corrupted file
             if OUTPUT_CSV.exists():
                 backup_path = OUTPUT_CSV.with_suffix('.csv.backup')
                 OUTPUT_CSV.rename(backup_path)
                 print(f"📦 Backed up existing file to: {backup_path}")
+            processed = set()
     
+    if not readonly:
+        write_ids_index(processed)
     return processed
 
 
-def save_checkpoint(sentence_id: str):
-    """Save the last processed ID"""
-    with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
-        f.write(sentence_id)
+def normalize_sentence(text: str) -> str:
+    """Key under which identical English sentences share a translation"""
+    return _WS_RE.sub(' ', text.lower()).strip()
+
+
+def translation_line(key: str, translation: str) -> str:
+    """Line of the translation cache file: the normalized English, a tab, then the translation on one line"""
+    return f"{key}\t{_WS_RE.sub(' ', translation).strip()}\n"
+
+
+def load_translation_cache(readonly: bool = False) -> dict[str, str]:
+    """
+    Map normalized English to a Tunisian translation already scraped.
+    Reads the TRANSLATIONS_FILE sidecar, so a resume does not parse the output CSV;
+    only when it is missing or unreadable is the map rebuilt from the CSV and,
+    unless readonly, written back as a new sidecar.
+    """
+    if TRANSLATIONS_FILE.exists():
+        cache = {}
+        try:
+            with open(TRANSLATIONS_FILE, 'r', encoding='utf-8', newline='\n') as f:
+                for line in f:
+                    fields = line.split('\t')
+                    # Skips a line cut short by a crash, and the line appended onto it afterwards
+                    if len(fields) == 2 and fields[1].endswith('\n'):
+                        cache[fields[0]] = fields[1][:-1]
+            return cache
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"⚠️  Warning: Could not read {TRANSLATIONS_FILE.name} ({e}).")
+    
+    cache = {}
+    if OUTPUT_CSV.exists():
+        print("🔁 Rebuilding translation cache from CSV...")
+        try:
+            with open(OUTPUT_CSV, 'r', encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    if row.get('english') and row.get('tunisian'):
+                        cache[normalize_sentence(row['english'])] = row['tunisian']
+        except (csv.Error, UnicodeDecodeError) as e:
+            print(f"⚠️  Warning: Could not read translation cache from CSV ({e}). Continuing with {len(cache)} entries.")
+    
+    if not readonly:
+        tmp_path = TRANSLATIONS_FILE.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.writelines(translation_line(key, translation) for key, translation in cache.items())
+        os.replace(tmp_path, TRANSLATIONS_FILE)
+    return cache
+
+
+def open_translations_file():
+    """Open the translation cache file for appending, or return None if there is none to keep up to date"""
+    if not TRANSLATIONS_FILE.exists():
+        return None
+    return open(TRANSLATIONS_FILE, 'a', encoding='utf-8', newline='\n')
+
+
+def write_ids_index(ids: Set[str]):
+    """Replace the processed ID index with the given IDs"""
+    tmp_path = IDS_FILE.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(f"{sentence_id}\n" for sentence_id in ids)
+    os.replace(tmp_path, IDS_FILE)
+
+
+def csv_header(fieldnames: list[str]) -> bytes:
+    """Format the CSV header line"""
+    return (",".join(fieldnames) + "\n").encode('utf-8')
+
+
+def csv_row(sentence_id: str, *texts: str) -> bytes:
+    """
+    Format one CSV line for our fixed schemas: the numeric ID as is, every text field quoted.
+    Always quoting reads back the same as the csv module's minimal quoting.
+    """
+    quoted = ('"' + text.replace('"', '""') + '"' for text in texts)
+    return (sentence_id + "," + ",".join(quoted) + "\n").encode('utf-8')
+
+
+def sync_file(f):
+    """Push buffered rows to disk"""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class FlushPolicy:
+    """
+    Flush and fsync files once FLUSH_EVERY rows or FLUSH_INTERVAL_S seconds
+    have accumulated since the last flush, whichever comes first.
+    Files are flushed in the order given.
+    """
+
+    def __init__(self, *files, every: int = FLUSH_EVERY, interval: float = FLUSH_INTERVAL_S):
+        self.files = files
+        self.every = every
+        self.interval = interval
+        self.rows_since_flush = 0
+        self.last_flush_ts = time.monotonic()
+
+    def row_written(self):
+        """Record one written row, flushing if a threshold was crossed"""
+        self.rows_since_flush += 1
+        if (self.rows_since_flush >= self.every
+                or time.monotonic() - self.last_flush_ts >= self.interval):
+            self.flush()
+
+    def flush(self):
+        for f in self.files:
+            sync_file(f)
+        self.rows_since_flush = 0
+        self.last_flush_ts = time.monotonic()
+
+
+def add_flush_args(parser: argparse.ArgumentParser):
+    """Add the --flush-every / --flush-interval options"""
+    parser.add_argument("--flush-every", type=int, default=FLUSH_EVERY,
+                        help=f"flush output files every N rows (default: {FLUSH_EVERY})")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL_S,
+                        help=f"flush output files at least every N seconds (default: {FLUSH_INTERVAL_S:g})")
+
+
+def check_flush_args(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Reject flush options added by add_flush_args that cannot work"""
+    if args.flush_every < 1:
+        parser.error("--flush-every must be at least 1")
+
+
+def save_checkpoint(last_id: Optional[str], success: int):
+    """
+    Atomically save the resume state.
+    success is the total number of translated rows in the output CSV, which vouches for the ID index.
+    last_id is the ID of the last sentence the scraper wrote out; results are written in
+    completion order, not input order, so it is only informational and resuming relies on the index.
+    """
+    state = {
+        'version': CHECKPOINT_VERSION,
+        'last_id': last_id,
+        'success': success,
+        'ts': time.time(),
+    }
+    tmp_path = CHECKPOINT_FILE.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, CHECKPOINT_FILE)
 
 
-def load_checkpoint() -> Optional[str]:
-    """Load the last processed ID"""
-    if CHECKPOINT_FILE.exists():
+def load_checkpoint() -> Optional[dict]:
+    """Load the resume state, or None if it is missing, unreadable, outdated or stale"""
+    if not CHECKPOINT_FILE.exists():
+        return None
+    
+    try:
         with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-            return f.read().strip()
-    return None
+            state = json.load(f)
+    except (OSError, ValueError):
+        # Unreadable, or a pre-JSON checkpoint holding only the last ID
+        return None
+    
+    if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+        return None
+    # A damaged or hand-edited checkpoint is ignored like a missing one, so the index is rebuilt
+    if ('last_id' not in state or not isinstance(state['last_id'], (str, type(None)))
+            or not isinstance(state.get('success'), int)
+            or not isinstance(state.get('ts'), (int, float)) or not math.isfinite(state['ts'])):
+        return None
+    if time.time() - state['ts'] >= CHECKPOINT_MAX_AGE_S:
+        return None
+    return state
 
 
-def read_sentences():
-    """Read sentences from TSV file"""
-    sentences = []
-    with open(INPUT_TSV, 'r', encoding='utf-8') as f:
+def read_sentences(skip: Set[str], shards: int = 1, shard_id: int = 0) -> Iterator[tuple[str, str]]:
+    """
+    Stream (id, text) pairs of English sentences from the TSV file, skipping IDs in skip.
+    With several shards, only IDs where id % shards == shard_id are yielded.
+    """
+    # Lines are split as bytes; only the ID and the sentence of kept rows get decoded
+    with open(INPUT_TSV, 'rb', buffering=TSV_BUFFER) as f:
         for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 3:
-                sentence_id, lang, text = parts[0], parts[1], parts[2]
-                if lang == 'eng':
-                    sentences.append((sentence_id, text))
-    return sentences
+            parts = line.rstrip(b'\r\n').split(b'\t', 3)
+            if len(parts) < 3 or parts[1] != b'eng':
+                continue
+            if shards > 1 and int(parts[0]) % shards != shard_id:
+                continue
+            sentence_id = parts[0].decode('ascii')
+            if sentence_id not in skip:
+                yield sentence_id, parts[2].decode('utf-8')
 
 
-def main():
-    """Main scraping function"""
+def shard_path(path: Path, shard_id: int) -> Path:
+    """Per-shard variant of an output path, e.g. en_tn_couples.shard2.csv"""
+    return path.with_name(f"{path.stem}.shard{shard_id}{path.suffix}")
+
+
+def use_shard_paths(shard_id: int):
+    """Point the output, index, translation cache, checkpoint and failed files of this process at one shard"""
+    global OUTPUT_CSV, IDS_FILE, TRANSLATIONS_FILE, CHECKPOINT_FILE, FAILED_CSV
+    OUTPUT_CSV = shard_path(OUTPUT_CSV, shard_id)
+    IDS_FILE = shard_path(IDS_FILE, shard_id)
+    TRANSLATIONS_FILE = shard_path(TRANSLATIONS_FILE, shard_id)
+    CHECKPOINT_FILE = shard_path(CHECKPOINT_FILE, shard_id)
+    FAILED_CSV = shard_path(FAILED_CSV, shard_id)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Scrape English-Tunisian translation pairs from Klemy")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE,
+                        help=f"sentences sent per request; only use >1 if the endpoint accepts "
+                             f"several texts at once (default: {BATCH_SIZE})")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false",
+                        help="always call the API, even for sentences whose text was already translated")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split the IDs into N shards (id %% N), each scraped by its own process")
+    parser.add_argument("--shard-id", type=int,
+                        help="scrape only shard K of --shards; without it every shard is started")
+    add_flush_args(parser)
+    args = parser.parse_args(argv)
+    
+    if args.batch < 1:
+        parser.error("--batch must be at least 1")
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.shard_id is not None and not 0 <= args.shard_id < args.shards:
+        parser.error(f"--shard-id must be between 0 and {args.shards - 1}")
+    check_flush_args(parser, args)
+    return args
+
+
+def run_shards(args: argparse.Namespace):
+    """Scrape every shard in its own process, each with its own client and rate limiter"""
+    # Load the main index and translation cache once here so the workers do not all read them
+    base_ids = load_processed_ids(load_checkpoint())
+    base_cache = load_translation_cache() if args.dedup else None
+    
+    processes = [
+        multiprocessing.Process(
+            target=scrape,
+            args=(argparse.Namespace(**{**vars(args), 'shard_id': shard_id}), base_ids, base_cache),
+            name=f"shard{shard_id}",
+        )
+        for shard_id in range(args.shards)
+    ]
+    for process in processes:
+        process.start()
+    
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Workers received the same interrupt; let them write their summaries
+        for process in processes:
+            process.join()
+    
+    failed = [shard_id for shard_id, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        label = "Shard" if len(failed) == 1 else "Shards"
+        print(f"\n❌ {label} {', '.join(map(str, failed))} stopped with an error (see above)")
+        print(f"♻️  Run again to finish them, then run merge_shards.py --shards {args.shards}")
+        raise SystemExit(1)
+    
+    print(f"\n🧩 Run merge_shards.py --shards {args.shards} to append the shard outputs to {OUTPUT_CSV.name}")
+
+
+def scrape(args: argparse.Namespace, base_ids: Optional[Set[str]] = None,
+           base_cache: Optional[dict[str, str]] = None):
+    """
+    Scrape the sentences selected by args.
+    base_ids are IDs already in the main output and base_cache its translation cache;
+    a shard loads them itself when not given.
+    """
+    translation_cache = {}
+    if args.shard_id is not None:
+        # Other shards may be loading the main files right now: never rewrite them from here
+        if base_ids is None:
+            base_ids = load_processed_ids(load_checkpoint(), readonly=True)
+        if args.dedup:
+            translation_cache = dict(base_cache) if base_cache is not None else load_translation_cache(readonly=True)
+        use_shard_paths(args.shard_id)
+    else:
+        base_ids = set()
+    
     print("🚀 Starting English-Tunisian Translation Scraper")
     print(f"📁 Input: {INPUT_TSV}")
     print(f"💾 Output: {OUTPUT_CSV}")
     print()
     
-    # Load sentences
-    print("📖 Reading sentences...")
-    sentences = read_sentences()
-    print(f"✅ Found {len(sentences)} English sentences")
-    
     # Check for existing progress
-    processed_ids = load_processed_ids()
+    checkpoint = load_checkpoint()
+    processed_ids = load_processed_ids(checkpoint)
     if processed_ids:
         print(f"♻️  Found {len(processed_ids)} already processed sentences")
-        sentences = [(sid, text) for sid, text in sentences if sid not in processed_ids]
-        print(f"📝 Remaining: {len(sentences)} sentences")
     
-    if not sentences:
-        print("✨ All sentences already processed!")
-        return
+    # Translations already scraped for the same English text are reused instead of requested
+    if args.dedup:
+        translation_cache.update(load_translation_cache())
+    
+    # Sentences are streamed from the TSV, already processed ones are skipped on the fly
+    skip = processed_ids | base_ids if base_ids else processed_ids
+    sentences = read_sentences(skip, args.shards, args.shard_id or 0)
     
     # Initialize CSV files
     file_exists = OUTPUT_CSV.exists()
-    csv_file = open(OUTPUT_CSV, 'a', encoding='utf-8', newline='')
-    writer = csv.DictWriter(csv_file, fieldnames=['id', 'english', 'tunisian'])
+    csv_file = open(OUTPUT_CSV, 'ab', buffering=CSV_BUFFER)
     
     if not file_exists:
-        writer.writeheader()
+        csv_file.write(csv_header(OUTPUT_FIELDS))
     
     # Initialize failed translations CSV
     failed_exists = FAILED_CSV.exists()
-    failed_file = open(FAILED_CSV, 'a', encoding='utf-8', newline='')
-    failed_writer = csv.DictWriter(failed_file, fieldnames=['id', 'english', 'status'])
+    failed_file = open(FAILED_CSV, 'ab', buffering=CSV_BUFFER)
     
     if not failed_exists:
-        failed_writer.writeheader()
+        failed_file.write(csv_header(FAILED_FIELDS))
+    
+    # Index of translated IDs, flushed right after the CSV so it never runs ahead of it
+    ids_file = open(IDS_FILE, 'a', encoding='utf-8')
+    # New translations, so the next run can load its cache without parsing the CSV
+    translations_file = open_translations_file()
+    
+    index_files = [f for f in (ids_file, translations_file) if f]
+    
+    csv_flush = FlushPolicy(csv_file, *index_files, every=args.flush_every, interval=args.flush_interval)
+    failed_flush = FlushPolicy(failed_file, every=args.flush_every, interval=args.flush_interval)
     
     # Process sentences
     print(f"\n🔄 Starting scraping...")
-    print(f"⏱️  Rate limit: {REQUEST_DELAY}s between requests")
+    print(f"⏱️  Rate limit: {REQUEST_DELAY}s between requests, up to {MAX_CONCURRENT} in flight")
     print()
     
     success_count = 0
     fail_count = 0
+    cache_hits = 0
+    last_id = checkpoint['last_id'] if checkpoint else None
     
-    try:
-        for sentence_id, english_text in tqdm(sentences, desc="Scraping"):
-            # Translate
-            tunisian_text, status = translate_with_retry(english_text, sentence_id)
-            
-            if status == 'success':
-                # Save to CSV
-                writer.writerow({
-                    'id': sentence_id,
-                    'english': english_text,
-                    'tunisian': tunisian_text
-                })
-                csv_file.flush()  # Ensure data is written
-                success_count += 1
+    def handle_result(sentence_id: str, english_text: str, tunisian_text: Optional[str], status: str):
+        nonlocal success_count, fail_count, cache_hits, last_id
+        
+        if status == 'success':
+            # Save to CSV
+            csv_file.write(csv_row(sentence_id, english_text, tunisian_text))
+            ids_file.write(f"{sentence_id}\n")
+            csv_flush.row_written()
+            success_count += 1
+            key = normalize_sentence(english_text)
+            if args.dedup and key in translation_cache:
+                # Copied from an identical sentence, cached or translated alongside this one
+                cache_hits += 1
             else:
-                # Save failed translation
-                failed_writer.writerow({
-                    'id': sentence_id,
-                    'english': english_text,
-                    'status': status
-                })
-                failed_file.flush()
-                fail_count += 1
-            
-            # Save checkpoint
-            save_checkpoint(sentence_id)
-            
-            # Rate limiting
-            time.sleep(REQUEST_DELAY)
+                if args.dedup:
+                    translation_cache[key] = tunisian_text
+                if translations_file:
+                    translations_file.write(translation_line(key, tunisian_text))
+        else:
+            # Save failed translation
+            failed_file.write(csv_row(sentence_id, english_text, status))
+            failed_flush.row_written()
+            fail_count += 1
+        
+        # Save checkpoint
+        last_id = sentence_id
+        save_checkpoint(last_id, len(processed_ids) + success_count)
+    
+    def cached_translation(english_text: str) -> Optional[str]:
+        return translation_cache.get(normalize_sentence(english_text))
+    
+    try:
+        desc = "Scraping" if args.shard_id is None else f"Shard {args.shard_id}"
+        asyncio.run(translate_all(sentences, handle_result, desc=desc, batch_size=args.batch,
+                                  lookup=cached_translation if args.dedup else None, position=args.shard_id))
+        if success_count + fail_count == 0:
+            print("✨ All sentences already processed!")
     
     except KeyboardInterrupt:
         print("\n\n⚠️  Interrupted by user")
     finally:
-        csv_file.close()
-        failed_file.close()
+        for f in (csv_file, *index_files, failed_file):
+            sync_file(f)
+            f.close()
+        save_checkpoint(last_id, len(processed_ids) + success_count)
         print(f"\n\n📊 Summary:")
         print(f"✅ Successfully scraped: {success_count}")
+        if cache_hits:
+            print(f"♻️  Reused from identical sentences: {cache_hits}")
         print(f"❌ Failed: {fail_count}")
         print(f"💾 Saved to: {OUTPUT_CSV}")
         print(f"📝 Failed sentences: {FAILED_CSV}")
         print(f"🔍 Debug log: {DEBUG_LOG}")
         
-        if CHECKPOINT_FILE.exists():
-            last_id = load_checkpoint()
+        if last_id:
             print(f"📍 Last processed ID: {last_id}")
-            print(f"♻️  Run again to resume from this point")
+            print(f"♻️  Run again to resume: sentences already processed are skipped")
+
+
+def main(argv=None):
+    """Main scraping function"""
+    args = parse_args(argv)
+    
+    if args.shards > 1 and args.shard_id is None:
+        run_shards(args)
+    else:
+        scrape(args)
 
 
 if __name__ == "__main__":
@@ -3,47 +3,89 @@ Split TSV file from a specific ID onwards
 Creates a new file with sentences starting from the given ID
 """
 
+import mmap
+import os
+import shutil
 from pathlib import Path
+from typing import Optional
 
 
 INPUT_TSV = Path(__file__).parent / "eng_sentences_second_half.tsv"
 OUTPUT_TSV = Path(__file__).parent / "eng_sentences_second_half2.tsv"
 START_ID = "10159624"  # Change this to your desired starting ID
 
+COUNT_CHUNK = 1 << 20  # bytes scanned per step when counting lines
+COPY_BUFFER = 1 << 20  # buffer size for the copyfileobj fallback
+
+
+def find_id_offset(buf: mmap.mmap, start_id: str) -> Optional[int]:
+    """Return the byte offset of the line starting with start_id, or None if absent"""
+    prefix = start_id.encode('utf-8') + b'\t'
+    if buf[:len(prefix)] == prefix:
+        return 0
+
+    # Search for the ID at the start of any other line in one C-level scan
+    pos = buf.find(b'\n' + prefix)
+    if pos < 0:
+        return None
+    return pos + 1
+
+
+def count_lines(buf: mmap.mmap, start: int, end: int) -> int:
+    """Count newline-terminated lines (plus a trailing partial one) in buf[start:end]"""
+    count = 0
+    for offset in range(start, end, COUNT_CHUNK):
+        count += buf[offset:min(offset + COUNT_CHUNK, end)].count(b'\n')
+    if end > start and buf[end - 1:end] != b'\n':
+        count += 1
+    return count
+
+
+def copy_from_offset(src, dst, offset: int):
+    """Copy src from offset to EOF into dst, in the kernel via sendfile where supported"""
+    remaining = os.fstat(src.fileno()).st_size - offset
+    try:
+        while remaining > 0:
+            sent = os.sendfile(dst.fileno(), src.fileno(), offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+        return
+    except (AttributeError, OSError):
+        # No sendfile, or not supported between these files: copy in large blocks instead
+        pass
+
+    src.seek(offset)
+    shutil.copyfileobj(src, dst, COPY_BUFFER)
+
 
 def split_tsv_from_id(start_id: str):
     """Split TSV file starting from a specific ID"""
-    
+
     print(f"📖 Reading from: {INPUT_TSV}")
     print(f"🎯 Starting from ID: {start_id}")
-    
-    found_start = False
-    line_count = 0
-    written_count = 0
-    
-    with open(INPUT_TSV, 'r', encoding='utf-8') as infile:
-        with open(OUTPUT_TSV, 'w', encoding='utf-8') as outfile:
-            for line in infile:
-                line_count += 1
-                
-                # Check if this line starts with the target ID
-                if not found_start:
-                    if line.startswith(start_id + '\t'):
-                        found_start = True
-                        print(f"✅ Found starting ID at line {line_count}")
-                
-                # Write all lines after finding the start ID
-                if found_start:
-                    outfile.write(line)
-                    written_count += 1
-    
-    if not found_start:
+
+    if INPUT_TSV.stat().st_size == 0:
         print(f"❌ ID {start_id} not found in file!")
-        OUTPUT_TSV.unlink()  # Delete the empty output file
         return
-    
+
+    with open(INPUT_TSV, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        offset = find_id_offset(buf, start_id)
+        if offset is None:
+            print(f"❌ ID {start_id} not found in file!")
+            return
+
+        lines_before = count_lines(buf, 0, offset)
+        print(f"✅ Found starting ID at line {lines_before + 1}")
+
+        with open(OUTPUT_TSV, 'wb') as outfile:
+            copy_from_offset(infile, outfile, offset)
+
+        written_count = count_lines(buf, offset, len(buf))
+
     print(f"\n📊 Summary:")
-    print(f"📝 Total lines in original: {line_count}")
+    print(f"📝 Total lines in original: {lines_before + written_count}")
     print(f"✂️  Lines written to new file: {written_count}")
     print(f"💾 Output saved to: {OUTPUT_TSV}")
 